@@ -14,13 +14,20 @@ import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
-from langdetect import detect, DetectorFactory
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
+from langdetect import DetectorFactory
+from langdetect.detector_factory import PROFILES_DIRECTORY
 import plotly.graph_objects as go
+import functools
+import os
+import re
+import threading
+import time
 import requests
-import pycountry
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 
 # ── Load API keys from .env file ────────────────────────────────────────────────
 CLIENT_ID = st.secrets["SPOTIFY_CLIENT_ID"]
@@ -34,20 +41,24 @@ LAST_CLIENT_ID = st.secrets["LAST_CLIENT_ID"]
 # and 'playlist-modify-private' allows us to create private playlists on their behalf.
 scope = "user-top-read playlist-modify-private"
 
-# Set up the Spotify OAuth authorization manager.
-# This handles the process of logging the user in and getting a valid access token.
-auth_manager = SpotifyOAuth(
-    client_id=CLIENT_ID,
-    client_secret=CLIENT_SECRET,
-    redirect_uri=REDIRECT_URI,
-    scope=scope,
-    show_dialog=True,
-    cache_path=".cache"
-)
+# Set up the Spotify OAuth authorization manager and the Spotipy client.
+# The auth manager handles logging the user in and getting a valid access token.
+# Both are built once with st.cache_resource so every rerun reuses the same
+# client and its pooled HTTP session instead of reconnecting to Spotify.
+@st.cache_resource(show_spinner=False)
+def get_spotify():
+    auth_manager = SpotifyOAuth(
+        client_id=CLIENT_ID,
+        client_secret=CLIENT_SECRET,
+        redirect_uri=REDIRECT_URI,
+        scope=scope,
+        show_dialog=True,
+        cache_path=".cache"
+    )
+    return spotipy.Spotify(auth_manager=auth_manager, requests_session=True)
 
-# Create a Spotipy client using the auth manager above.
 # This 'sp' object will be used to interact with the Spotify Web API.
-sp = spotipy.Spotify(auth_manager=auth_manager)
+sp = get_spotify()
 
 # ── 3. Page Configuration ───────────────────────────────────────────────────────
 # Configure the Streamlit page.
@@ -88,25 +99,124 @@ except Exception as e:
 # ── 5. Helper: Get Artist Country from Last.fm ───────────────────────────────────
 # Tries to detect the artist's country of origin using Last.fm's API.
 # It parses the artist bio and looks for any country names inside it.
-def get_artist_country_lastfm(artist_name):
-    try:
-        # Call the Last.fm API to get artist info, using their name
-        url = (f"http://ws.audioscrobbler.com/2.0/?method=artist.getinfo"
-               f"&artist={artist_name}&api_key={LAST_CLIENT_ID}&format=json")
-        res = requests.get(url).json()
-
-        # Extract the artist biography text from the JSON response
-        bio = res.get("artist", {}).get("bio", {}).get("content", "")
-
-        # Check if any official country name appears in the biography text
-        for country in [c.name for c in pycountry.countries]:
-            if country.lower() in bio.lower():
-                return country
-        # If no country match is found, return "Unknown"
-        return "Unknown"
-    except Exception:
-        # If anything goes wrong (e.g., API error), just return "Unknown"
+# Results are cached for an hour so Streamlit reruns don't re-hit Last.fm.
+# A shared session keeps the HTTP connection alive between artist lookups, and is
+# built once with st.cache_resource (like the Spotify client) so it outlives reruns.
+# Transient errors and rate limiting are retried with a short backoff, and the
+# connection pool is sized so every worker thread can keep its own connection.
+LASTFM_WORKERS = 8  # lookups in flight at once; the request rate is capped separately below
+LASTFM_MAX_RPS = 5  # Last.fm asks clients to stay under 5 requests per second
+LASTFM_TIMEOUT = (2, 5)  # (connect, read) seconds, so a hung request can't stall the app
+# Last.fm error codes that mean "try again later" (operation failed, service offline,
+# temporarily unavailable, rate limit exceeded) rather than a missing artist.
+LASTFM_TRANSIENT_ERRORS = {8, 11, 16, 29}
+LASTFM_RETRY_AFTER = 120  # seconds before a failed artist lookup is tried again
+
+@st.cache_resource(show_spinner=False)
+def get_lastfm_session():
+    session = requests.Session()
+    session.headers.update({"User-Agent": "music-profile-analytics"})
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504])
+    for prefix in ("http://", "https://"):
+        session.mount(prefix, HTTPAdapter(max_retries=retry, pool_maxsize=LASTFM_WORKERS))
+    return session
+
+# Spaces Last.fm requests at least 1 / LASTFM_MAX_RPS seconds apart across all worker
+# threads. The schedule lives in st.cache_resource, so it's shared by every rerun and session.
+@st.cache_resource(show_spinner=False)
+def get_lastfm_throttle():
+    return {"lock": threading.Lock(), "next_slot": 0.0}
+
+def _wait_for_lastfm_slot():
+    throttle = get_lastfm_throttle()
+    with throttle["lock"]:
+        now = time.monotonic()
+        slot = max(now, throttle["next_slot"])
+        throttle["next_slot"] = slot + 1 / LASTFM_MAX_RPS
+    time.sleep(slot - now)
+
+# Index the country names once per process with st.cache_resource, instead of
+# rebuilding the names and regex on every lookup or rerun.
+# All names share one compiled regex that matches whole words, so "Oman" no longer
+# matches inside "woman". Bios usually say "Indian singer" or "Japanese band", so
+# each name may also carry a common adjective suffix ("India" -> "Indian"), and
+# names ending in a vowel or "y" also match from their stem ("Italy" -> "Italian").
+# An adjective that is also the first word of a longer name belongs to that
+# longer country, so "Dominican singer" means the Dominican Republic, not Dominica.
+DEMONYM_SUFFIXES = "n|an|ian|ese|ish|i"
+STEM_SUFFIXES = "an|ian|ese|ish"
+
+# Sample bios checked against the index when it's built, covering the common
+# adjective forms and the Dominica / Dominican Republic case.
+SAMPLE_BIOS = {
+    "Indian playback singer": "India",
+    "Japanese rock band": "Japan",
+    "Nigerian rapper": "Nigeria",
+    "Dominican singer": "Dominican Republic",
+}
+
+def _match_country(bio, index):
+    by_lower, stems, longer_names, pattern = index
+    match = pattern.search(bio.lower())
+    if not match:
         return "Unknown"
+    if match.group() in longer_names:
+        return longer_names[match.group()]
+    if match.group("name"):
+        return by_lower[match.group("name")]
+    return stems[match.group("stem")]
+
+@st.cache_resource(show_spinner=False)
+def _country_index():
+    import pycountry
+    by_lower = {c.name.lower(): c.name for c in pycountry.countries}
+    stems = {}
+    for lower, name in by_lower.items():
+        if lower[-1] in "aeoy":
+            stems.setdefault(lower[:-1], name)
+
+    # Leading words of multi-word names ("dominican" -> "Dominican Republic")
+    longer_names = {}
+    for lower, name in by_lower.items():
+        words = lower.split(" ")
+        for i in range(1, len(words)):
+            prefix = " ".join(words[:i])
+            if prefix not in by_lower:
+                longer_names.setdefault(prefix, name)
+
+    # Longest names first, so "Papua New Guinea" wins over "Guinea"
+    def alternation(words):
+        return "|".join(map(re.escape, sorted(words, key=len, reverse=True)))
+
+    pattern = re.compile(
+        r"(?<!\w)(?:(?P<name>" + alternation(by_lower) + r")(?:" + DEMONYM_SUFFIXES + r")?"
+        r"|(?P<stem>" + alternation(stems) + r")(?:" + STEM_SUFFIXES + r"))(?!\w)"
+    )
+    index = (by_lower, stems, longer_names, pattern)
+    for bio, expected in SAMPLE_BIOS.items():
+        found = _match_country(bio, index)
+        if found != expected:
+            raise ValueError(f"Country index matched {bio!r} to {found!r}, expected {expected!r}")
+    return index
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_artist_country_lastfm(artist_name):
+    # Call the Last.fm API to get artist info, using their name.
+    # Request failures are raised instead of returning "Unknown", because Streamlit
+    # doesn't cache exceptions: a timeout or outage can be retried later (see lookup_countries).
+    url = (f"http://ws.audioscrobbler.com/2.0/?method=artist.getinfo"
+           f"&artist={artist_name}&api_key={LAST_CLIENT_ID}&format=json")
+    _wait_for_lastfm_slot()
+    res = get_lastfm_session().get(url, timeout=LASTFM_TIMEOUT).json()
+    if res.get("error") in LASTFM_TRANSIENT_ERRORS:
+        raise RuntimeError(f"Last.fm error {res['error']}: {res.get('message', '')}")
+
+    # Extract the artist biography text from the JSON response
+    bio = res.get("artist", {}).get("bio", {}).get("content", "")
+
+    # Return the first official country name (or its adjective) mentioned in the bio,
+    # or "Unknown" if there isn't one
+    return _match_country(bio, _country_index())
 
 # ── 6. Chart Styling Helper ─────────────────────────────────────────────────────
 # Applies consistent layout and hover styling to Plotly charts.
@@ -117,6 +227,139 @@ def style_chart(fig):
     fig.update_traces(hovertemplate="%{x}: %{y}<extra></extra>")
     return fig
 
+# Builds every count/average table the Charts tab needs in one place,
+# so each table is computed once. It is only called from chart_figures(),
+# whose cache already covers it.
+def chart_tables(df):
+    artist_freq = df["Artist"].value_counts().reset_index()
+    artist_freq.columns = ["Artist", "Count"]
+    album_counts = df["Album"].value_counts().reset_index()
+    album_counts.columns = ["Album", "Count"]
+    return {
+        "genre_counts": df["Genre"].value_counts(),
+        "lang_counts": df["Language"].value_counts(),
+        "explicit_counts": df["Explicit"].value_counts(),
+        "release_counts": df["Release Year"].value_counts().sort_index(),
+        "lang_exp": pd.crosstab(df["Language"], df["Explicit"]).stack().reset_index(name="Count"),
+        "year_exp": pd.crosstab(df["Release Year"], df["Explicit"]).stack().reset_index(name="Count"),
+        "genre_explicit": pd.crosstab(df["Genre"], df["Explicit"]).stack().reset_index(name="Count"),
+        "artist_popularity": df.groupby("Artist")["Popularity"].mean().sort_values(ascending=False).reset_index(),
+        "genre_popularity": df.groupby("Genre", observed=True)["Popularity"].mean().sort_values(ascending=False).reset_index(),
+        "artist_freq": artist_freq,
+        "album_counts": album_counts,
+    }
+
+# Builds every Plotly figure on the Charts tab from the tables above.
+# The figures are cached too, so reruns (tab switches, sidebar changes)
+# don't rebuild them unless the track data itself changed. Entries expire with
+# the same hourly ttl as fetch_tracks, and the cache is bounded so refreshed
+# data can't keep adding figure sets.
+@st.cache_data(ttl=3600, max_entries=50, show_spinner=False)
+def chart_figures(df, df_short, df_medium, df_long):
+    agg = chart_tables(df)
+    explicit_counts = agg["explicit_counts"]
+    genre_counts = agg["genre_counts"]
+    lang_counts = agg["lang_counts"]
+    release_counts = agg["release_counts"]
+
+    # Grouped bars comparing the genre breakdown across the 3 time periods
+    fig_evo = go.Figure()
+    for label, dataset in zip(["Short", "Medium", "Long"], [df_short, df_medium, df_long]):
+        genre_cnt = dataset["Genre"].value_counts()
+        fig_evo.add_trace(go.Bar(x=genre_cnt.index, y=genre_cnt.values, name=label))
+    fig_evo.update_layout(barmode="group")
+
+    figs = {
+        "popularity": px.bar(df, x="Track Name", y="Popularity", color="Artist"),
+        "duration": px.bar(df, x="Track Name", y="Duration (min)", color="Artist"),
+        "explicit": px.pie(
+            names=explicit_counts.index,
+            values=explicit_counts.values,
+            hole=0.4 # Makes it a donut chart
+        ),
+        "genres": px.pie(names=genre_counts.index, values=genre_counts.values),
+        "lang": px.bar(
+            x=lang_counts.index,
+            y=lang_counts.values,
+            labels={"x": "Language", "y": "Track Count"}
+        ),
+        "lang_exp": px.bar(
+            agg["lang_exp"],
+            x="Language", y="Count",
+            color="Explicit",
+            barmode="group",
+            title="Explicit vs Clean Tracks by Language"
+        ),
+        "release": px.bar(
+            x=release_counts.index, y=release_counts.values,
+            labels={"x": "Year", "y": "Track Count"}
+        ),
+        "year_exp": px.bar(
+            agg["year_exp"], x="Release Year", y="Count",
+            color="Explicit", barmode="group"
+        ),
+        "evolution": fig_evo,
+        "artist": px.bar(
+            agg["artist_popularity"].head(10),
+            x="Artist", y="Popularity",
+            color="Popularity",
+            title="Most Popular Artists (on Avg)"
+        ),
+        "artist_freq": px.bar(
+            agg["artist_freq"].head(10), x="Artist", y="Count",
+            color="Count",
+            title="Artists You Listen to Most"
+        ),
+        "albums": px.bar(
+            agg["album_counts"].head(10),
+            x="Album", y="Count",
+            color="Count",
+            title="Albums with Most Tracks in Your Top List"
+        ),
+        "genre_pop": px.bar(
+            agg["genre_popularity"].head(10),
+            x="Genre", y="Popularity",
+            color="Popularity",
+            title="Top Performing Genres"
+        ),
+        "scatter": px.scatter(
+            df, x="Release Year", y="Popularity",
+            color="Genre", hover_name="Track Name"
+        ),
+        "heatmap": px.density_heatmap(
+            agg["genre_explicit"], x="Genre", y="Explicit", z="Count",
+            color_continuous_scale="Blues"
+        ),
+        "corr": px.imshow(
+            df[["Duration (min)", "Popularity"]].corr(),
+            text_auto=True, color_continuous_scale="Viridis"
+        ),
+    }
+    return {name: style_chart(fig) for name, fig in figs.items()}
+
+# Groups points into k clusters with a small NumPy k-means (Lloyd's algorithm).
+# With only 20 tracks this is instant, and it saves loading scikit-learn at startup.
+# Starts from k random tracks (seeded, so clusters are stable across reruns)
+# and stops early once the cluster centers stop moving.
+def kmeans_labels(points, k=3, iterations=20, seed=42):
+    if len(points) < k:
+        # Too few tracks to form k clusters, so give each track its own
+        return np.arange(len(points))
+    rng = np.random.default_rng(seed)
+    centers = points[rng.choice(len(points), size=k, replace=False)]
+    for _ in range(iterations):
+        distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        # Move each center to the mean of its tracks (keep it in place if it has none)
+        new_centers = np.array([
+            points[labels == i].mean(axis=0) if np.any(labels == i) else centers[i]
+            for i in range(k)
+        ])
+        if np.allclose(new_centers, centers):
+            break
+        centers = new_centers
+    return labels
+
 # ── 7. Sidebar: Time Range Selector ─────────────────────────────────────────────
 # Create a dropdown in the sidebar to let users pick which time range they want to analyze.
 # Spotify lets us pull data from short_term (1 month), medium_term (6 months), or long_term (all time).
@@ -130,63 +373,151 @@ time_range = st.sidebar.selectbox(
 
 # ── 8. Fetch Top Tracks ─────────────────────────────────────────────────────────
 # Make language detection deterministic by fixing the random seed
+DetectorFactory.seed = 0
+
+# langdetect loads all 55 language profiles by default, which costs a lot of memory.
+# Track and artist names only need the common languages, so load just those.
+LANGDETECT_LANGUAGES = {"en", "es", "fr", "de", "it", "pt", "ru", "ja", "ko",
+                        "zh-cn", "zh-tw", "hi", "ar", "id", "tr"}
+
+# The factory is built on first use and kept with st.cache_resource for the life
+# of the process, so reruns (and cached fetches) never re-read the profile files.
+@st.cache_resource(show_spinner=False)
+def get_langdetect_factory():
+    profiles = []
+    for lang in sorted(LANGDETECT_LANGUAGES):
+        with open(os.path.join(PROFILES_DIRECTORY, lang), encoding="utf-8") as f:
+            profiles.append(f.read())
+    factory = DetectorFactory()
+    factory.load_json_profile(profiles)
+    return factory
+
+# The same track often shows up in several time ranges. This function is redefined
+# on every rerun, so the lru_cache only dedupes detections within one load.
+@functools.lru_cache(maxsize=1024)
+def _fast_detect(text):
+    detector = get_langdetect_factory().create()
+    detector.append(text)
+    return detector.detect()
+
 # Fetches the user's top 20 tracks from Spotify and processes each one
 # to extract useful metadata for display and analysis.
-DetectorFactory.seed = 0
+# Results are cached for an hour per (time range, user); 'user_id' is only
+# there as the cache key so one user's tracks are never served to another.
+# Errors are raised out of the cached function so a failed fetch isn't cached;
+# load_tracks() below shows the error and falls back to empty data.
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_tracks(time_range, user_id):
+    top_tracks = sp.current_user_top_tracks(limit=20, time_range=time_range)
+    if not top_tracks["items"]:
+        return pd.DataFrame()
 
-def fetch_tracks(time_range):
+    # Fetch every artist in one batched request instead of one call per track
+    # (we use the first artist listed for each track). Spotify allows up to 50 ids.
+    artist_ids = list(dict.fromkeys(item["artists"][0]["id"] for item in top_tracks["items"]))
+    artists_map = {a["id"]: a for a in sp.artists(artist_ids)["artists"] if a}
+
+    # Collect the data column by column, so pandas builds each column in one go
+    cols = {name: [] for name in [
+        "Track Name", "Artist", "Album", "Genre", "Language", "duration_ms",
+        "Popularity", "Explicit", "release_date", "URI"
+    ]}
+    for item in top_tracks["items"]:
+        artist_info = artists_map.get(item["artists"][0]["id"], {})
+        genres = artist_info.get("genres", [])
+
+        # Try to detect the language of the track name + artist name
+        try:
+            lang_input = f"{item['name']} {item['artists'][0]['name']}"
+            language = _fast_detect(lang_input)
+        except Exception:
+            language = "unknown"
+
+        # Append all extracted data for this track to the matching columns
+        cols["Track Name"].append(item["name"])
+        cols["Artist"].append(item["artists"][0]["name"])
+        cols["Album"].append(item["album"]["name"])
+        cols["Genre"].append(genres[0] if genres else "Unknown")
+        cols["Language"].append(language)
+        cols["duration_ms"].append(item["duration_ms"])
+        cols["Popularity"].append(item["popularity"])
+        cols["Explicit"].append("Explicit" if item["explicit"] else "Clean")
+        cols["release_date"].append(item["album"]["release_date"])
+        cols["URI"].append(item["uri"])
+
+    # Convert the columns into a pandas DataFrame for easy analysis and plotting
+    df = pd.DataFrame(cols)
+
+    # Low-cardinality labels are stored as categoricals, which group faster and use less memory
+    for col in ["Genre", "Language", "Explicit"]:
+        df[col] = df[col].astype("category")
+
+    # Derive the numeric columns in one vectorized pass. Release Year is stored as
+    # an integer so year charts sort numerically instead of as strings.
+    df["duration_ms"] = (df["duration_ms"] / 60000).round(2)
+    df["release_date"] = df["release_date"].str[:4].astype("int16")
+    return df.rename(columns={"duration_ms": "Duration (min)", "release_date": "Release Year"})
+
+# Loads one time range from the cached fetch, showing an error and returning
+# empty data if Spotify fails.
+def load_tracks(time_range):
     try:
-        top_tracks = sp.current_user_top_tracks(limit=20, time_range=time_range)
-        if not top_tracks["items"]:
-            return pd.DataFrame()
-
-        rows = []
-        for item in top_tracks["items"]: # Get artist information (we use the first artist listed for each track)
-            artist_id = item["artists"][0]["id"]
-            artist_info = sp.artist(artist_id)
-            genres = artist_info.get("genres", [])
-
-            # Try to detect the language of the track name + artist name
-            try:
-                lang_input = f"{item['name']} {item['artists'][0]['name']}"
-                language = detect(lang_input)
-            except Exception:
-                language = "unknown"
-
-            # Try to detect artist country using Last.fm bio
-            country = get_artist_country_lastfm(item["artists"][0]["name"])
-
-            # Append all extracted data for this track into the rows list
-            rows.append({
-                "Track Name": item["name"],
-                "Artist": item["artists"][0]["name"],
-                "Album": item["album"]["name"],
-                "Genre": genres[0] if genres else "Unknown",
-                "Language": language,
-                "Duration (min)": round(item["duration_ms"] / 60000, 2),
-                "Popularity": item["popularity"],
-                "Explicit": "Explicit" if item["explicit"] else "Clean",
-                "Release Year": item["album"]["release_date"][:4],
-                "Country": country
-            })
-
-        # Convert the list of rows into a pandas DataFrame for easy analysis and plotting
-        return pd.DataFrame(rows)
-
+        return fetch_tracks(time_range, user["id"])
     except Exception as e:
         # If anything fails (e.g. API error), show a Streamlit error and return empty data
         st.error(f"Failed to fetch data: {e}")
         return pd.DataFrame()
 
+# Looks up each artist's country on Last.fm in parallel, since each call is just
+# waiting on the network. Countries are joined outside fetch_tracks, so a failed
+# lookup doesn't get baked into the cached track data for an hour.
+# Failed artists show "Unknown" and are remembered in session_state for
+# LASTFM_RETRY_AFTER seconds, so an outage or rate limit isn't hit again on every click.
+def lookup_countries(artist_names):
+    if "lastfm_failed" not in st.session_state:
+        st.session_state.lastfm_failed = {}
+    failed = st.session_state.lastfm_failed
+    now = time.monotonic()
+
+    def country_or_unknown(artist_name):
+        if now - failed.get(artist_name, float("-inf")) < LASTFM_RETRY_AFTER:
+            return "Unknown"
+        try:
+            country = get_artist_country_lastfm(artist_name)
+        except Exception:
+            failed[artist_name] = time.monotonic()
+            return "Unknown"
+        failed.pop(artist_name, None)
+        return country
+
+    with ThreadPoolExecutor(max_workers=LASTFM_WORKERS) as executor:
+        return dict(zip(artist_names, executor.map(country_or_unknown, artist_names)))
+
 # ── 9. Load Data ────────────────────────────────────────────────────────────────
 # Preload the user's top tracks from all 3 time ranges:
 # short_term = last 4 weeks, medium_term = last 6 months, long_term = all time
-df_short  = fetch_tracks("short_term")
-df_medium = fetch_tracks("medium_term")
-df_long   = fetch_tracks("long_term")
-
-# Also fetch the top tracks based on the currently selected time range (from sidebar)
-df = fetch_tracks(time_range)
+# These come from the cache after the first load, so tab switches are instant.
+frames = {
+    "short_term": load_tracks("short_term"),
+    "medium_term": load_tracks("medium_term"),
+    "long_term": load_tracks("long_term"),
+}
+
+# Look up every unique artist across the three time ranges in a single pass,
+# then add the Country column to each DataFrame.
+artist_names = list(dict.fromkeys(
+    name for frame in frames.values() if not frame.empty for name in frame["Artist"]
+))
+artist_country = lookup_countries(artist_names)
+for frame in frames.values():
+    if not frame.empty:
+        frame.insert(frame.columns.get_loc("URI"), "Country",
+                     frame["Artist"].map(artist_country).astype("category"))
+df_short, df_medium, df_long = frames["short_term"], frames["medium_term"], frames["long_term"]
+
+# The selected time range (from sidebar) is always one of the three above, so reuse it.
+# Copy it since the clustering tab adds a column to this DataFrame.
+df = frames[time_range].copy()
 
 if df.empty:
     st.warning("No data found.")
@@ -211,6 +542,7 @@ with tab1:
 # 10b. Charts tab
 # Interactive visual analysis of top tracks
 with tab2:
+    figs = chart_figures(df, df_short, df_medium, df_long)
     with tab2:
         # Subdivide the Charts section into 5 sub-tabs, each focusing on a specific type of analysis.
         subtab1, subtab2, subtab3, subtab4, subtab5 = st.tabs([
@@ -227,26 +559,16 @@ with tab2:
             # Colored by artist to see which artists contribute most to the user's popular picks.
             with col1:
                 st.subheader("Top Tracks by Popularity")
-                st.plotly_chart(style_chart(
-                    px.bar(df, x="Track Name", y="Popularity", color="Artist")
-                ), use_container_width=True)
+                st.plotly_chart(figs["popularity"], use_container_width=True)
 
             # Bar chart of longest tracks by duration
             with col2:
                 st.subheader("Top Tracks by Duration (min)")
-                st.plotly_chart(style_chart(
-                    px.bar(df, x="Track Name", y="Duration (min)", color="Artist")
-                ), use_container_width=True)
+                st.plotly_chart(figs["duration"], use_container_width=True)
 
             # Pie chart to show what % of songs are marked Explicit (vs. Clean) by Spotify.
             st.subheader("Overall Explicit Content Breakdown")
-            explicit_counts = df["Explicit"].value_counts()
-            fig_explicit = px.pie(
-                names=explicit_counts.index,
-                values=explicit_counts.values,
-                hole=0.4 # Makes it a donut chart
-            )
-            st.plotly_chart(style_chart(fig_explicit), use_container_width=True)
+            st.plotly_chart(figs["explicit"], use_container_width=True)
 
         # ── Cultural Insights ─────────────────────────────────────────
         # Here we dive into genres, languages, and how they relate to explicit content.
@@ -255,33 +577,17 @@ with tab2:
             with col1:
                 st.subheader("Genre Distribution")
                 # Pie chart to show which genres dominate the user's listening habits.
-                genre_counts = df["Genre"].value_counts()
-                fig_genres = px.pie(names=genre_counts.index, values=genre_counts.values)
-                st.plotly_chart(style_chart(fig_genres), use_container_width=True)
+                st.plotly_chart(figs["genres"], use_container_width=True)
 
             with col2:
                 st.subheader("Detected Song Languages")
                 # I used a language detection model on track/artist names earlier.
                 # This helps visualize how international the user's music taste is.
-                lang_counts = df["Language"].value_counts()
-                fig_lang = px.bar(
-                    x=lang_counts.index,
-                    y=lang_counts.values,
-                    labels={"x": "Language", "y": "Track Count"}
-                )
-                st.plotly_chart(style_chart(fig_lang), use_container_width=True)
+                st.plotly_chart(figs["lang"], use_container_width=True)
 
             st.subheader("Explicitness by Language")
             # Compare explicit vs. clean songs *by language*, e.g. is English more explicit than Spanish?
-            lang_exp = df.groupby(["Language", "Explicit"]).size().reset_index(name="Count")
-            fig_lang_exp = px.bar(
-                lang_exp,
-                x="Language", y="Count",
-                color="Explicit",
-                barmode="group",
-                title="Explicit vs Clean Tracks by Language"
-            )
-            st.plotly_chart(style_chart(fig_lang_exp), use_container_width=True)
+            st.plotly_chart(figs["lang_exp"], use_container_width=True)
 
         # ── Time & Trends ─────────────────────────────────────────────
         # Looks at how your top tracks evolved over time in terms of release year and genre.
@@ -290,32 +596,17 @@ with tab2:
             with col1:
                 st.subheader("Release Year Distribution")
                 # How old are your favorite tracks? A bar chart showing number of songs per year.
-                release_counts = df["Release Year"].value_counts().sort_index()
-                fig_release = px.bar(
-                    x=release_counts.index, y=release_counts.values,
-                    labels={"x": "Year", "y": "Track Count"}
-                )
-                st.plotly_chart(style_chart(fig_release), use_container_width=True)
+                st.plotly_chart(figs["release"], use_container_width=True)
 
             with col2:
                 st.subheader("Explicit Tracks Over Time")
                 # Do you listen to more explicit content in recent years? This grouped chart shows that.
-                year_exp = df.groupby(["Release Year", "Explicit"]).size().reset_index(name="Count")
-                fig_year_exp = px.bar(
-                    year_exp, x="Release Year", y="Count",
-                    color="Explicit", barmode="group"
-                )
-                st.plotly_chart(style_chart(fig_year_exp), use_container_width=True)
+                st.plotly_chart(figs["year_exp"], use_container_width=True)
 
             st.subheader("Listening Evolution by Genre")
             # Compare genre breakdown across 3 time periods.
             # Great for identifying shifts in taste (e.g. more EDM recently).
-            fig_evo = go.Figure()
-            for label, dataset in zip(["Short", "Medium", "Long"], [df_short, df_medium, df_long]):
-                genre_cnt = dataset["Genre"].value_counts()
-                fig_evo.add_trace(go.Bar(x=genre_cnt.index, y=genre_cnt.values, name=label))
-            fig_evo.update_layout(barmode="group")
-            st.plotly_chart(style_chart(fig_evo), use_container_width=True)
+            st.plotly_chart(figs["evolution"], use_container_width=True)
 
         # ── 🧑‍🎤 Artists & Albums ────────────────────────────────────────
         # This section highlights the most popular and frequent artists/albums in your top tracks.
@@ -324,52 +615,23 @@ with tab2:
             with col1:
                 st.subheader("Top Artists by Average Popularity")
                 # For each artist, calculate their average popularity score across all your top tracks.
-                artist_popularity = df.groupby("Artist")["Popularity"].mean().sort_values(ascending=False).reset_index()
-                fig_artist = px.bar(
-                    artist_popularity.head(10),
-                    x="Artist", y="Popularity",
-                    color="Popularity",
-                    title="Most Popular Artists (on Avg)"
-                )
-                st.plotly_chart(style_chart(fig_artist), use_container_width=True)
+                st.plotly_chart(figs["artist"], use_container_width=True)
 
             with col2:
                 st.subheader("Most Frequent Artists")
                 # Which artists appear the most in your top tracks? (Not necessarily most popular.)
-                artist_freq = df["Artist"].value_counts().reset_index()
-                artist_freq.columns = ["Artist", "Count"]
-                fig_freq = px.bar(
-                    artist_freq.head(10), x="Artist", y="Count",
-                    color="Count",
-                    title="Artists You Listen to Most"
-                )
-                st.plotly_chart(style_chart(fig_freq), use_container_width=True)
+                st.plotly_chart(figs["artist_freq"], use_container_width=True)
 
             col3, col4 = st.columns(2)
             with col3:
                 st.subheader("Top Albums by Frequency")
                 # What albums do you have the most tracks from in your top list?
-                album_counts = df["Album"].value_counts().reset_index()
-                album_counts.columns = ["Album", "Count"]
-                fig_albums = px.bar(
-                    album_counts.head(10),
-                    x="Album", y="Count",
-                    color="Count",
-                    title="Albums with Most Tracks in Your Top List"
-                )
-                st.plotly_chart(style_chart(fig_albums), use_container_width=True)
+                st.plotly_chart(figs["albums"], use_container_width=True)
 
             with col4:
                 st.subheader("Genres with Highest Popularity")
                 # Which genres tend to have higher average popularity in your library?
-                genre_popularity = df.groupby("Genre")["Popularity"].mean().sort_values(ascending=False).reset_index()
-                fig_genre_pop = px.bar(
-                    genre_popularity.head(10),
-                    x="Genre", y="Popularity",
-                    color="Popularity",
-                    title="Top Performing Genres"
-                )
-                st.plotly_chart(style_chart(fig_genre_pop), use_container_width=True)
+                st.plotly_chart(figs["genre_pop"], use_container_width=True)
 
         # ── 🧪 Advanced Analysis ─────────────────────────────────────────
         # Final layer of insights: more technical plots for deeper patterns.
@@ -378,27 +640,16 @@ with tab2:
             with col1:
                 st.subheader("Popularity vs Release Year")
                 # Scatter plot to explore how popularity relates to release year (grouped by genre).
-                fig_scatter = px.scatter(
-                    df, x="Release Year", y="Popularity",
-                    color="Genre", hover_name="Track Name"
-                )
-                st.plotly_chart(style_chart(fig_scatter), use_container_width=True)
+                st.plotly_chart(figs["scatter"], use_container_width=True)
 
             with col2:
                 st.subheader("Genre vs Explicitness Heatmap")
                 # Heatmap that shows which genres have more explicit or clean content overall.
-                genre_explicit = df.groupby(["Genre", "Explicit"]).size().reset_index(name="Count")
-                fig_heatmap = px.density_heatmap(
-                    genre_explicit, x="Genre", y="Explicit", z="Count",
-                    color_continuous_scale="Blues"
-                )
-                st.plotly_chart(style_chart(fig_heatmap), use_container_width=True)
+                st.plotly_chart(figs["heatmap"], use_container_width=True)
 
             # Finally, explore how track length and popularity correlate
             st.subheader("Correlation Matrix")
-            corr_data = df[["Duration (min)", "Popularity"]].corr()
-            fig_corr = px.imshow(corr_data, text_auto=True, color_continuous_scale="Viridis")
-            st.plotly_chart(style_chart(fig_corr), use_container_width=True)
+            st.plotly_chart(figs["corr"], use_container_width=True)
 
 # 10c. Playlist and Clustering tab
 with tab3:
@@ -433,16 +684,11 @@ with tab3:
         # Only show the playlist creation UI if one hasn’t already been made in this session
         if not st.session_state.playlist_created:
             st.subheader("Create Your Playlist")
-            track_uris = []
-
-            # For each song in the top track list, search for its URI using Spotify’s search endpoint
-            for _, r in df.iterrows():
-                res = sp.search(q=f"{r['Track Name']} {r['Artist']}", type="track", limit=1)
-                if res["tracks"]["items"]:
-                    track_uris.append(res["tracks"]["items"][0]["uri"])
 
-            # Once we have all URIs, allow the user to click a button to create the playlist
-            if track_uris and st.button("+ Create Spotify Playlist"):
+            # Only build the playlist once the user clicks. The track URIs were already
+            # returned with the top tracks, so no extra search calls are needed.
+            if st.button("+ Create Spotify Playlist"):
+                track_uris = df["URI"].tolist()
                 playlist = sp.user_playlist_create(
                     user=user["id"],
                     name="My Favorite Tracks",
@@ -478,14 +724,15 @@ with tab3:
 
         # We’ll use only two features: duration and popularity.
         # In a real system we could include more audio features like valence, tempo, etc.
-        feat = df[["Duration (min)", "Popularity"]].copy()
+        feat = df[["Duration (min)", "Popularity"]].to_numpy(dtype=float)
 
-        # Normalize the data so KMeans works properly (prevents scale dominance)
-        scaled = StandardScaler().fit_transform(feat)
+        # Normalize the data so k-means works properly (prevents scale dominance).
+        # Columns with no spread are left unscaled, same as StandardScaler.
+        std = feat.std(axis=0)
+        scaled = (feat - feat.mean(axis=0)) / np.where(std == 0, 1, std)
 
-        # Apply KMeans clustering to group tracks into 3 similarity clusters
-        kmeans = KMeans(n_clusters=3, random_state=42).fit(scaled)
-        df["Cluster"] = kmeans.labels_ # Add cluster label to each track in the DataFrame
+        # Apply k-means clustering to group tracks into 3 similarity clusters
+        df["Cluster"] = kmeans_labels(scaled, k=3) # Add cluster label to each track in the DataFrame
 
         # Visualize the clusters in a scatterplot: Duration vs. Popularity
         st.plotly_chart(style_chart(
@@ -501,8 +748,11 @@ with tab4:
     # - Popularity is below 40 (more likely unknown or underrated)
     # - Lyrics are clean (non-explicit)
     # - Genre is known (ignore 'Unknown' for better recommendations)
-    hidden = df[(df["Popularity"] < 40) &
-                (df["Explicit"] == "Clean") &
-                (df["Genre"] != "Unknown")]
+    mask = np.logical_and.reduce([
+        df["Popularity"].to_numpy() < 40,
+        df["Explicit"].to_numpy() == "Clean",
+        df["Genre"].to_numpy() != "Unknown"
+    ])
+    hidden = df[mask]
     # Display the list of hidden gems in a table so users can discover new favorites
     st.dataframe(hidden, use_container_width=True)
\ No newline at end of file